@@ -0,0 +1,66 @@
+"""Benchmark LangSmith snapshot polling through the full app.
+
+Compares ``server.main.app`` (snapshots answered by ``SnapshotMiddleware``
+ahead of every other middleware) with a bare FastAPI app that only mounts
+the LangSmith router, for both full 200 responses and 304 revalidations.
+
+Usage: python benchmarks/bench_langsmith.py [iterations]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+import statistics
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.langsmith import router as langsmith_router, _snapshots
+from server.main import app
+
+PATH = "/tenants"
+
+# server.main configures INFO logging; keep per-request client lines out of the output
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def bare_app() -> FastAPI:
+    bare = FastAPI()
+    bare.include_router(langsmith_router)
+    return bare
+
+
+async def bench(target: FastAPI, name: str, iterations: int, headers=None) -> None:
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        for _ in range(100):
+            await client.get(PATH, headers=headers)
+        timings = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            response = await client.get(PATH, headers=headers)
+            timings.append((time.perf_counter() - t0) * 1_000_000)
+        assert response.status_code in (200, 304)
+    timings.sort()
+    print(f"{name:<40} p50={statistics.median(timings):.1f}us "
+          f"p99={timings[int(len(timings) * 0.99)]:.1f}us")
+
+
+async def run(iterations: int) -> None:
+    revalidate = {"If-None-Match": _snapshots[PATH].etag}
+    bare = bare_app()
+    await bench(bare, "bare app, 200", iterations)
+    await bench(bare, "bare app, 304", iterations, revalidate)
+    await bench(app, "full app, 200", iterations)
+    await bench(app, "full app, 304", iterations, revalidate)
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    asyncio.run(run(iterations))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark filtered thread listings against the indexed storage layer.
+
+Each timing is for one full page as served by the list endpoints
+(``IndexedStore.query_page``), not a single bounded ``query`` call.
+
+Usage: python benchmarks/bench_storage.py [num_threads]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.storage import IndexedStore
+
+NUM_ASSISTANTS = 100
+NUM_USERS = 1000
+
+
+def populate(store: IndexedStore, n: int) -> None:
+    # Random assignment so field and metadata filters are uncorrelated; region
+    # is tied to the assistant so some combinations never match.
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    for i in range(n):
+        thread_id = f"thread_{i:08d}"
+        assistant = rng.randrange(NUM_ASSISTANTS)
+        store[thread_id] = {
+            "id": thread_id,
+            "assistant_id": f"asst_{assistant}",
+            "metadata": {
+                "user": f"user_{rng.randrange(NUM_USERS)}",
+                "vip": rng.random() < 0.02,
+                "region": "eu" if assistant < NUM_ASSISTANTS // 2 else "us",
+            },
+            "created_at": (start + timedelta(milliseconds=i)).isoformat(),
+            "messages": [],
+        }
+
+
+def bench(store: IndexedStore, name: str, iterations: int = 1000, **kwargs) -> None:
+    timings = []
+    cursor = None
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        _, cursor = store.query_page(cursor=cursor, **kwargs)
+        timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    print(f"{name:<40} p50={statistics.median(timings):.4f}ms "
+          f"p99={timings[int(len(timings) * 0.99)]:.4f}ms")
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    store = IndexedStore(fields=("assistant_id",))
+    t0 = time.perf_counter()
+    populate(store, n)
+    print(f"Inserted {n} threads in {time.perf_counter() - t0:.2f}s")
+
+    bench(store, "all threads, limit=100")
+    bench(store, "by assistant_id, limit=100", filters={"assistant_id": "asst_7"})
+    bench(store, "by metadata.user, limit=20", metadata={"user": "user_42"}, limit=20)
+    bench(store, "assistant_id + metadata.vip, limit=20",
+          filters={"assistant_id": "asst_1"}, metadata={"vip": "true"}, limit=20)
+    bench(store, "assistant_id + metadata.user, limit=20",
+          filters={"assistant_id": "asst_1"}, metadata={"user": "user_2"}, limit=20)
+    bench(store, "assistant_id + user + vip, limit=20",
+          filters={"assistant_id": "asst_1"}, metadata={"user": "user_2", "vip": "true"}, limit=20)
+    bench(store, "assistant_id + region (no match)",
+          filters={"assistant_id": "asst_1"}, metadata={"region": "us"}, limit=20)
+    bench(store, "metadata.user + metadata.vip, limit=20",
+          metadata={"user": "user_2", "vip": "true"}, limit=20)
+    bench(store, "metadata.vip + region (no match), limit=20",
+          metadata={"vip": "true", "region": "mars"}, limit=20)
+    bench(store, "metadata.vip + region (uncorrelated)",
+          metadata={"vip": "true", "region": "us"}, limit=20)
+    bench(store, "user + vip + region, limit=20",
+          metadata={"user": "user_2", "vip": "true", "region": "us"}, limit=20)
+
+if __name__ == "__main__":
+    main()
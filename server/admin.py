@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from .profiling import profiles, token_matches
+
+async def require_profile_token(x_profile_token: Optional[str] = Header(None)):
+    # 404 rather than 403 so the endpoints are not discoverable without the token
+    if not token_matches(x_profile_token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+router = APIRouter(dependencies=[Depends(require_profile_token)])
+
+@router.get("/admin/profiles")
+async def list_profiles(limit: int = Query(20, ge=1)):
+    return {"data": [p.summary() for p in profiles.recent(limit)]}
+
+@router.get("/admin/profiles/collapsed", response_class=PlainTextResponse)
+async def download_collapsed(limit: int = Query(20, ge=1)):
+    """Merged collapsed stacks of the last ``limit`` profiles, for flamegraph.pl or speedscope."""
+    return "".join(p.collapsed() for p in profiles.recent(limit))
+
+@router.get("/admin/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+async def download_profile(profile_id: str):
+    for profile in profiles.recent():
+        if profile.id == profile_id:
+            return profile.collapsed()
+    raise HTTPException(status_code=404, detail="Profile not found")
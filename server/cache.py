@@ -4,6 +4,7 @@ import json
 import os
 import logging
 from functools import wraps
+from .profiling import span
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +28,8 @@ class Cache:
         if not self.enabled or not self._redis:
             return None
         try:
-            value = self._redis.get(key)
+            with span("cache.get"):
+                value = self._redis.get(key)
             return json.loads(value) if value else None
         except Exception as e:
             logger.error(f"Redis get error: {e}")
@@ -37,7 +39,8 @@ class Cache:
         if not self.enabled or not self._redis:
             return False
         try:
-            self._redis.setex(key, expire, json.dumps(value))
+            with span("cache.set"):
+                self._redis.setex(key, expire, json.dumps(value))
             return True
         except Exception as e:
             logger.error(f"Redis set error: {e}")
@@ -47,7 +50,8 @@ class Cache:
         if not self.enabled or not self._redis:
             return False
         try:
-            return bool(self._redis.delete(key))
+            with span("cache.delete"):
+                return bool(self._redis.delete(key))
         except Exception as e:
             logger.error(f"Redis delete error: {e}")
             return False
@@ -0,0 +1,49 @@
+from typing import Dict, Optional
+from uuid import UUID
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .profiling import Profile
+
+
+class NodeSpanCallback(BaseCallbackHandler):
+    """Records LangGraph node and chat model timings as profile spans."""
+
+    def __init__(self, profile: Profile):
+        self.profile = profile
+        self._runs: Dict[UUID, tuple] = {}
+
+    def _start(self, run_id: UUID, name: str, thread_id: Optional[int] = None) -> None:
+        self._runs[run_id] = (name, time.perf_counter(), thread_id)
+
+    def _end(self, run_id: UUID) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            name, start, thread_id = run
+            self.profile.add_span(name, start, time.perf_counter())
+            if thread_id is not None:
+                self.profile.exit_thread(thread_id)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # Runnables nested inside a node inherit its metadata; only time the node itself
+        if node is not None and kwargs.get("name") == node:
+            self._start(run_id, f"node:{node}")
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chat_model"
+        # Sync model calls fire this inline on the thread making the call
+        self._start(run_id, f"llm:{name}", self.profile.enter_thread())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
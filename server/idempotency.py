@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+import asyncio
+import hashlib
+import json
+import os
+import time
+import logging
+
+from .cache import Cache
+from .profiling import span
+
+logger = logging.getLogger(__name__)
+
+# Requests carrying an Idempotency-Key are remembered for a day; requests
+# without one are deduplicated by content hash only within a short window,
+# so an intentionally repeated message still goes through after it.
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_WINDOW = int(os.getenv("IDEMPOTENCY_WINDOW", "30"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Resolves an in-flight future whose owner was cancelled, telling waiters to retry
+_ABANDONED = object()
+
+
+class IdempotencyConflict(ValueError):
+    """An Idempotency-Key was reused with a different request payload."""
+
+
+def fingerprint(scope: str, payload: Any) -> str:
+    body = json.dumps([scope, jsonable_encoder(payload)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Remembers write results so retried requests replay the original response.
+
+    Completed results live in an in-process LRU table with per-entry expiry
+    and are mirrored to Redis when REDIS_URL is set. Identical requests that
+    arrive while the first is still running wait for its result instead of
+    running again.
+    """
+
+    def __init__(self, key_ttl: int = IDEMPOTENCY_KEY_TTL, window: int = IDEMPOTENCY_WINDOW,
+                 max_entries: int = IDEMPOTENCY_MAX_ENTRIES, cache: Optional[Cache] = None):
+        self.key_ttl = key_ttl
+        self.window = window
+        self.max_entries = max_entries
+        self._cache = cache if cache is not None else Cache()
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    def _local_get(self, key: str) -> Optional[Dict]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, entry = item
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _local_put(self, key: str, entry: Dict, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get(self, key: str, ttl: int) -> Optional[Dict]:
+        entry = self._local_get(key)
+        if entry is None and self._cache.enabled:
+            entry = await self._cache.get(key)
+            if entry is not None:
+                self._local_put(key, entry, ttl)
+        return entry
+
+    @staticmethod
+    def _check(stored: str, current: str) -> None:
+        if stored != current:
+            raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+
+    async def run(self, scope: str, payload: Any, func: Callable[[], Awaitable[Any]],
+                  idempotency_key: Optional[str] = None) -> Tuple[Any, bool]:
+        """Run ``func`` once per request identity; return ``(result, replayed)``."""
+        digest = fingerprint(scope, payload)
+        if idempotency_key:
+            key, ttl = f"idempotency:{scope}:key:{idempotency_key}", self.key_ttl
+        else:
+            key, ttl = f"idempotency:{scope}:hash:{digest}", self.window
+
+        while True:
+            with span("idempotency.lookup"):
+                entry = await self._get(key, ttl)
+            if entry is not None:
+                self._check(entry["fingerprint"], digest)
+                logger.info(f"Replaying stored response for {scope}")
+                return entry["result"], True
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self._check(inflight[0], digest)
+            logger.info(f"Joining in-flight request for {scope}")
+            result = await asyncio.shield(inflight[1])
+            if result is not _ABANDONED:
+                return result, True
+            # The original request was cancelled (e.g. client disconnect); try again
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (digest, future)
+        try:
+            result = jsonable_encoder(await func())
+        except asyncio.CancelledError:
+            # Don't propagate our cancellation to waiters; wake them to rerun func
+            future.set_result(_ABANDONED)
+            raise
+        except Exception as e:
+            # Failures are not stored, so a later retry runs again
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody was waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        entry = {"fingerprint": digest, "result": result}
+        self._local_put(key, entry, ttl)
+        # Wake waiters before awaiting Redis so a cancellation there can't strand them
+        future.set_result(result)
+        with span("idempotency.store"):
+            await self._cache.set(key, entry, ttl)
+        return result, False
+
+
+idempotency = IdempotencyStore()
+
+
+async def idempotent(response: Response, scope: str, payload: Any,
+                     func: Callable[[], Awaitable[Any]],
+                     idempotency_key: Optional[str] = None,
+                     store: Optional[IdempotencyStore] = None) -> Any:
+    """Route helper around ``IdempotencyStore.run`` that maps conflicts to 422."""
+    try:
+        result, replayed = await (store or idempotency).run(scope, payload, func, idempotency_key)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    return result
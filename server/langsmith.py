@@ -1,58 +1,184 @@
-from fastapi import APIRouter
-from datetime import datetime
+from fastapi import APIRouter, Request, Response
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
 
 router = APIRouter()
 
-@router.get("/tenants")
-async def get_tenants():
-    return {
-        "data": [{
-            "id": "default",
-            "name": "Default Tenant",
-            "created_at": datetime.utcnow().isoformat()
-        }]
+# The LangSmith UI polls these endpoints constantly, so they are served from
+# precomputed snapshots with stable timestamps and ETags instead of rebuilding
+# the payload on every request.
+CACHE_CONTROL = "private, max-age=30"
+
+# Fixed rather than taken from process start, so every worker and restart
+# produces identical snapshots and ETags.
+LANGSMITH_CREATED_AT = os.getenv("LANGSMITH_CREATED_AT", "2024-01-01T00:00:00")
+
+
+class Snapshot:
+    """Serialized JSON payload tagged with a version-derived ETag."""
+
+    def __init__(self, payload: Any, version: int = 1):
+        self.version = version
+        self.body = json.dumps(payload, separators=(",", ":")).encode()
+        digest = hashlib.sha1(self.body).hexdigest()[:16]
+        self.etag = f'"{version}-{digest}"'
+        self.raw_headers = [
+            (b"etag", self.etag.encode()),
+            (b"cache-control", CACHE_CONTROL.encode()),
+        ]
+
+
+_snapshots: Dict[str, Snapshot] = {}
+
+
+def publish(path: str, payload: Any) -> Snapshot:
+    """Store a new snapshot for ``path``, bumping its version if it changed."""
+    current = _snapshots.get(path)
+    snapshot = Snapshot(payload, current.version + 1 if current else 1)
+    if current is not None and snapshot.body == current.body:
+        return current
+    _snapshots[path] = snapshot
+    return snapshot
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _serve(request: Request, path: str) -> Response:
+    snapshot = _snapshots[path]
+    headers = {"ETag": snapshot.etag, "Cache-Control": CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+class SnapshotMiddleware:
+    """Pure ASGI middleware answering snapshot GETs before the rest of the stack.
+
+    Installed outermost, so polls skip the function middlewares, routing and
+    validation entirely. ``headers`` (e.g. CORS) are added to every response
+    since the middlewares that normally set them are bypassed.
+    """
+
+    def __init__(self, app, headers: Optional[Mapping[str, str]] = None):
+        self.app = app
+        self.headers: List[Tuple[bytes, bytes]] = [
+            (k.lower().encode(), v.encode()) for k, v in (headers or {}).items()
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        snapshot = _snapshots.get(scope["path"])
+        if snapshot is None:
+            return await self.app(scope, receive, send)
+
+        if_none_match = None
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+                break
+
+        headers = snapshot.raw_headers + self.headers
+        if _etag_matches(if_none_match, snapshot.etag):
+            status, body = 304, b""
+        else:
+            status, body = 200, snapshot.body
+            headers = headers + [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+publish("/tenants", {
+    "data": [{
+        "id": "default",
+        "name": "Default Tenant",
+        "created_at": LANGSMITH_CREATED_AT
+    }]
+})
+
+publish("/tenants/current/usage_limits", {
+    "has_exceeded_limit": False,
+    "limits": {}
+})
+
+publish("/workspaces/current/tags", {
+    "data": [],
+    "has_more": False
+})
+
+publish("/workspaces/current/stats", {
+    "total_runs": 0,
+    "total_tokens": 0,
+    "total_successful_runs": 0,
+    "total_error_runs": 0
+})
+
+publish("/workspaces", {
+    "data": [{
+        "id": "default",
+        "name": "Default Workspace",
+        "created_at": LANGSMITH_CREATED_AT
+    }]
+})
+
+publish("/orgs/current/info", {
+    "id": "default",
+    "name": "Default Organization",
+    "created_at": LANGSMITH_CREATED_AT,
+    "settings": {
+        "allow_token_sharing": True
     }
+})
+
+SNAPSHOT_PATHS = frozenset(_snapshots)
+
+
+class PollingAccessLogFilter(logging.Filter):
+    """Drop uvicorn access log lines for successful snapshot polls."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        args = record.args
+        if isinstance(args, tuple) and len(args) >= 5:
+            path = str(args[2]).split("?", 1)[0]
+            if path in SNAPSHOT_PATHS and int(args[4]) < 400:
+                return False
+        return True
+
+
+@router.get("/tenants")
+async def get_tenants(request: Request):
+    return _serve(request, "/tenants")
 
 @router.get("/tenants/current/usage_limits")
-async def get_usage_limits():
-    return {
-        "has_exceeded_limit": False,
-        "limits": {}
-    }
+async def get_usage_limits(request: Request):
+    return _serve(request, "/tenants/current/usage_limits")
 
 @router.get("/workspaces/current/tags")
-async def get_workspace_tags():
-    return {
-        "data": [],
-        "has_more": False
-    }
+async def get_workspace_tags(request: Request):
+    return _serve(request, "/workspaces/current/tags")
 
 @router.get("/workspaces/current/stats")
-async def get_workspace_stats():
-    return {
-        "total_runs": 0,
-        "total_tokens": 0,
-        "total_successful_runs": 0,
-        "total_error_runs": 0
-    }
+async def get_workspace_stats(request: Request):
+    return _serve(request, "/workspaces/current/stats")
 
 @router.get("/workspaces")
-async def get_workspaces():
-    return {
-        "data": [{
-            "id": "default",
-            "name": "Default Workspace",
-            "created_at": datetime.utcnow().isoformat()
-        }]
-    }
+async def get_workspaces(request: Request):
+    return _serve(request, "/workspaces")
 
 @router.get("/orgs/current/info")
-async def get_org_info():
-    return {
-        "id": "default",
-        "name": "Default Organization",
-        "created_at": datetime.utcnow().isoformat(),
-        "settings": {
-            "allow_token_sharing": True
-        }
-    }
+async def get_org_info(request: Request):
+    return _serve(request, "/orgs/current/info")
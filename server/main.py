@@ -1,15 +1,21 @@
 import logging
 import traceback
-from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi import FastAPI, Header, Request, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.routing import APIRoute
+from typing import Optional
 from main import graph
 from .routes import router as main_router
-from .langsmith import router as langsmith_router
+from .langsmith import router as langsmith_router, SNAPSHOT_PATHS, PollingAccessLogFilter, SnapshotMiddleware
+from .admin import router as admin_router
+from .idempotency import idempotent
+from .profiling import PROFILING_ENABLED, PROFILE_SAMPLE_RATE, PROFILE_TOKEN, current_profile
+from .callbacks import NodeSpanCallback
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+logging.getLogger("uvicorn.access").addFilter(PollingAccessLogFilter())
 
 class ErrorLoggingRoute(APIRoute):
     def get_route_handler(self):
@@ -46,15 +52,27 @@ app.add_middleware(
     max_age=1800,
 )
 
-from .middleware import add_cors_headers, catch_exceptions_middleware, RateLimiter
+from .middleware import add_cors_headers, catch_exceptions_middleware, RateLimiter, RequestProfiler, CORS_HEADERS
 
 app.middleware("http")(add_cors_headers)
 app.middleware("http")(catch_exceptions_middleware)
-app.middleware("http")(RateLimiter())
+app.middleware("http")(RateLimiter(exempt_paths=SNAPSHOT_PATHS))
 
 app.include_router(main_router)
 app.include_router(langsmith_router)
 
+# Installed last so it wraps the whole middleware chain
+if PROFILING_ENABLED and not PROFILE_TOKEN:
+    # Profiles could be collected but never downloaded or triggered on demand
+    logger.warning("PROFILING_ENABLED is set but PROFILE_TOKEN is not; profiling stays off")
+elif PROFILING_ENABLED:
+    logger.info(f"Profiling enabled (sample rate {PROFILE_SAMPLE_RATE})")
+    app.middleware("http")(RequestProfiler(sample_rate=PROFILE_SAMPLE_RATE))
+    app.include_router(admin_router)
+
+# Outermost: LangSmith polls are answered before any other middleware runs
+app.add_middleware(SnapshotMiddleware, headers=CORS_HEADERS)
+
 @app.get("/")
 async def root():
     return {"message": "LangGraph API Server"}
@@ -64,12 +82,19 @@ async def health_check():
     return {"status": "healthy"}
 
 @app.post("/v1/invoke")
-async def invoke(data: dict):
+async def invoke(data: dict, response: Response, idempotency_key: Optional[str] = Header(None)):
     logger.info("Invoking graph")
-    try:
-        result = graph.invoke(data)
-        return result
-    except Exception as e:
-        logger.error(f"Error in invoke: {e}")
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=str(e))
+
+    async def run_graph():
+        try:
+            profile = current_profile()
+            config = {"callbacks": [NodeSpanCallback(profile)]} if profile else None
+            # Async so the event loop keeps serving (and joining duplicate) requests meanwhile
+            result = await graph.ainvoke(data, config=config)
+            return result
+        except Exception as e:
+            logger.error(f"Error in invoke: {e}")
+            logger.error(traceback.format_exc())
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return await idempotent(response, "invoke", data, run_graph, idempotency_key)
@@ -1,2 +1,3 @@
-from .cors import add_cors_headers, catch_exceptions_middleware
+from .cors import add_cors_headers, catch_exceptions_middleware, CORS_HEADERS
 from .rate_limiter import RateLimiter
+from .profiler import RequestProfiler
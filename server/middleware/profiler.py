@@ -0,0 +1,50 @@
+from fastapi import Request, Response
+from typing import Callable
+import asyncio
+import random
+import threading
+import weakref
+import logging
+
+from ..profiling import (
+    Profile, ProfiledExecutor, ProfileStore, profiles, activate, token_matches, PROFILE_HEADER
+)
+
+logger = logging.getLogger(__name__)
+
+class RequestProfiler:
+    def __init__(self, sample_rate: float = 0.0, store: ProfileStore = profiles):
+        self.sample_rate = sample_rate
+        self.store = store
+        self._loops = weakref.WeakSet()
+
+    def _install_executor(self) -> None:
+        # Sync graph nodes run in the loop's default executor; swap in one whose
+        # workers join the active profile. Done lazily on the first profiled request.
+        loop = asyncio.get_running_loop()
+        if loop not in self._loops:
+            loop.set_default_executor(ProfiledExecutor())
+            self._loops.add(loop)
+
+    def _should_profile(self, request: Request) -> bool:
+        # The header only triggers a profile when it carries PROFILE_TOKEN
+        if token_matches(request.headers.get(PROFILE_HEADER)):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, request: Request, call_next: Callable) -> Response:
+        if not self._should_profile(request):
+            return await call_next(request)
+
+        self._install_executor()
+        profile = Profile(request.method, request.url.path)
+        with activate(profile):
+            profile.start(threading.get_ident())
+            try:
+                response = await call_next(request)
+            finally:
+                profile.stop()
+                self.store.add(profile)
+        logger.info(f"Profiled {request.method} {request.url.path} in {profile.duration_ms}ms")
+        response.headers["X-Profile-Id"] = profile.id
+        return response
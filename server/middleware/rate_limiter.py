@@ -1,14 +1,18 @@
 from fastapi import Request, Response
-from typing import Callable
+from typing import Callable, Iterable
 import time
 from collections import defaultdict
 
 class RateLimiter:
-    def __init__(self, requests_per_minute: int = 60):
+    def __init__(self, requests_per_minute: int = 60, exempt_paths: Iterable[str] = ()):
         self.requests_per_minute = requests_per_minute
+        self.exempt_paths = frozenset(exempt_paths)
         self.requests = defaultdict(list)
 
     async def __call__(self, request: Request, call_next: Callable) -> Response:
+        if request.url.path in self.exempt_paths:
+            return await call_next(request)
+
         client_ip = request.client.host
         now = time.time()
         
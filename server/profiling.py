@@ -0,0 +1,215 @@
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional
+import contextlib
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Profiling is opt-in: nothing is installed on the app unless enabled, and
+# span() is a shared no-op context manager when no profile is active.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HISTORY = int(os.getenv("PROFILE_HISTORY", "20"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+PROFILE_HEADER = "x-profile"
+# Shared secret: X-Profile must equal it to trigger a profile, and the admin
+# endpoints require it. The app does not install the profiler without it.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+
+_current_profile: ContextVar[Optional["Profile"]] = ContextVar("current_profile", default=None)
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profile:
+    """Stack samples and span timings collected for one request."""
+
+    def __init__(self, method: str, path: str):
+        self.id = f"prof_{uuid.uuid4().hex}"
+        self.method = method
+        self.path = path
+        self.created_at = datetime.utcnow().isoformat()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.samples: Counter = Counter()
+        self._span_stacks: Dict[int, List[str]] = {}
+        # Threads currently doing work for this request, with nesting counts
+        self._threads: Counter = Counter()
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def add_span(self, name: str, start: float, end: float) -> None:
+        self.spans.append({
+            "name": name,
+            "start_ms": round((start - self._start) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+        })
+
+    def enter_thread(self, thread_id: Optional[int] = None) -> int:
+        """Sample ``thread_id`` (default: the calling thread) until ``exit_thread``."""
+        if thread_id is None:
+            thread_id = threading.get_ident()
+        with self._lock:
+            self._threads[thread_id] += 1
+        return thread_id
+
+    def exit_thread(self, thread_id: int) -> None:
+        with self._lock:
+            self._threads[thread_id] -= 1
+            if self._threads[thread_id] <= 0:
+                del self._threads[thread_id]
+
+    def run_in_thread(self, fn, *args, **kwargs):
+        """Run ``fn`` with the calling (worker) thread registered for sampling."""
+        thread_id = self.enter_thread()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.exit_thread(thread_id)
+
+    def start(self, thread_id: int, interval: float = PROFILE_INTERVAL) -> None:
+        """Start sampling in a background thread.
+
+        ``thread_id`` (the event loop thread) is sampled for the whole request;
+        worker threads are sampled while they run work for it. Samples are
+        taken per thread, so other requests sharing those threads at the same
+        time can show up in the stacks as well.
+        """
+        self.enter_thread(thread_id)
+        self._sampler = threading.Thread(
+            target=self._sample, args=(interval,), daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _sample(self, interval: float) -> None:
+        root = f"{self.method} {self.path}"
+        while not self._stop.wait(interval):
+            frames = sys._current_frames()
+            for thread_id in tuple(self._threads):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                spans = [f"span:{name}" for name in tuple(self._span_stacks.get(thread_id, ()))]
+                self.samples[";".join([root, *spans, *stack])] += 1
+
+    def collapsed(self) -> str:
+        """Render samples in collapsed-stack format (``frame;frame count``)."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.items())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "created_at": self.created_at,
+            "duration_ms": self.duration_ms,
+            "samples": sum(self.samples.values()),
+            "spans": self.spans,
+        }
+
+
+class _Span:
+    def __init__(self, profile: Profile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self._thread_id = self.profile.enter_thread()
+        self.profile._span_stacks.setdefault(self._thread_id, []).append(self.name)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.add_span(self.name, self._start, time.perf_counter())
+        self.profile._span_stacks[self._thread_id].pop()
+        self.profile.exit_thread(self._thread_id)
+        return False
+
+
+def current_profile() -> Optional[Profile]:
+    return _current_profile.get()
+
+
+@contextlib.contextmanager
+def activate(profile: Profile) -> Iterator[Profile]:
+    """Make ``profile`` the active profile for the current context."""
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+def token_matches(value: Optional[str]) -> bool:
+    if not PROFILE_TOKEN or not value:
+        return False
+    return hmac.compare_digest(value.encode(), PROFILE_TOKEN.encode())
+
+
+def span(name: str):
+    """Time a block against the active request profile, if any."""
+    profile = _current_profile.get()
+    if profile is None:
+        return _NULL_SPAN
+    return _Span(profile, name)
+
+
+class ProfiledExecutor(ThreadPoolExecutor):
+    """Default-executor replacement that samples workers running profiled work.
+
+    ``loop.run_in_executor`` calls ``submit`` from the awaiting task, so the
+    active profile is visible here even though the job runs on another thread;
+    this is how sync LangGraph nodes run under ``graph.ainvoke``.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return super().submit(fn, *args, **kwargs)
+        return super().submit(profile.run_in_thread, fn, *args, **kwargs)
+
+
+class ProfileStore:
+    """Keeps the most recent completed profiles."""
+
+    def __init__(self, maxlen: int = PROFILE_HISTORY):
+        self._profiles: Deque[Profile] = deque(maxlen=maxlen)
+
+    def add(self, profile: Profile) -> None:
+        self._profiles.append(profile)
+
+    def recent(self, limit: Optional[int] = None) -> List[Profile]:
+        items = list(self._profiles)
+        return items[-limit:] if limit else items
+
+    def clear(self) -> None:
+        self._profiles.clear()
+
+
+profiles = ProfileStore()
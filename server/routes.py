@@ -1,21 +1,23 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from typing import Dict, Any, Optional
 from datetime import datetime
 import uuid
 import logging
 import traceback
 from .models import Assistant, Thread, Message, Deployment
 from .cache import cache_response
+from .storage import IndexedStore
+from .idempotency import idempotent
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # Storage (to be replaced with database)
-assistants: Dict[str, Dict] = {}
-threads: Dict[str, Dict] = {}
+assistants: IndexedStore = IndexedStore(fields=("model",))
+threads: IndexedStore = IndexedStore(fields=("assistant_id",))
 messages: Dict[str, Dict] = {}
-deployments: Dict[str, Dict] = {}
+deployments: IndexedStore = IndexedStore(fields=("status",))
 
 # Create default assistant
 default_assistant = Assistant(
@@ -27,11 +29,28 @@ default_assistant = Assistant(
 ).dict()
 assistants[default_assistant["id"]] = default_assistant
 
+def _metadata_filters(request: Request) -> Dict[str, str]:
+    """Collect ``metadata.<key>=<value>`` query params."""
+    return {
+        key[len("metadata."):]: value
+        for key, value in request.query_params.items()
+        if key.startswith("metadata.")
+    }
+
+def _list_page(store: IndexedStore, request: Request, filters: Dict[str, Any],
+               limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    filters = {k: v for k, v in filters.items() if v is not None}
+    try:
+        data, next_cursor = store.query_page(filters, _metadata_filters(request), limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"data": data, "has_more": next_cursor is not None, "next_cursor": next_cursor}
+
 @router.get("/v1/assistants")
-@cache_response(expire=300)  # Cache for 5 minutes
-async def list_assistants():
+async def list_assistants(request: Request, model: Optional[str] = None,
+                          limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None):
     logger.info("Listing assistants")
-    return {"data": list(assistants.values())}
+    return _list_page(assistants, request, {"model": model}, limit, cursor)
 
 @router.post("/v1/assistants")
 async def create_assistant(assistant: Assistant):
@@ -47,6 +66,12 @@ async def get_assistant(assistant_id: str):
         raise HTTPException(status_code=404, detail="Assistant not found")
     return assistants[assistant_id]
 
+@router.get("/v1/threads")
+async def list_threads(request: Request, assistant_id: Optional[str] = None,
+                       limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None):
+    logger.info("Listing threads")
+    return _list_page(threads, request, {"assistant_id": assistant_id}, limit, cursor)
+
 @router.post("/v1/threads")
 async def create_thread(thread: Thread):
     logger.info(f"Creating thread: {thread.id}")
@@ -61,14 +86,21 @@ async def get_thread(thread_id: str):
     return threads[thread_id]
 
 @router.post("/v1/threads/{thread_id}/messages")
-async def create_message(thread_id: str, message: Message):
+async def create_message(thread_id: str, message: Message, response: Response,
+                         idempotency_key: Optional[str] = Header(None)):
     logger.info(f"Creating message in thread: {thread_id}")
     if thread_id not in threads:
         raise HTTPException(status_code=404, detail="Thread not found")
-    message.thread_id = thread_id
-    messages[message.id] = message.dict()
-    threads[thread_id]["messages"].append(message.dict())
-    return message.dict()
+
+    async def append_message():
+        message.thread_id = thread_id
+        messages[message.id] = message.dict()
+        threads[thread_id]["messages"].append(message.dict())
+        return message.dict()
+
+    # Generated fields (id, created_at) differ between retries; hash only what the client sent
+    payload = {"thread_id": thread_id, "message": message.dict(exclude_unset=True)}
+    return await idempotent(response, "create_message", payload, append_message, idempotency_key)
 
 @router.get("/v1/threads/{thread_id}/messages")
 async def list_messages(thread_id: str):
@@ -103,9 +135,10 @@ async def get_run(thread_id: str, run_id: str):
     }
 
 @router.get("/deployments")
-async def list_deployments():
+async def list_deployments(request: Request, status: Optional[str] = None,
+                           limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None):
     logger.info("Listing deployments")
-    return {"data": list(deployments.values())}
+    return _list_page(deployments, request, {"status": status}, limit, cursor)
 
 @router.post("/deployments")
 async def create_deployment(deployment: Deployment):
@@ -0,0 +1,221 @@
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import base64
+import json
+import logging
+
+from .profiling import span
+
+logger = logging.getLogger(__name__)
+
+# Records are ordered by (created_at, id); every index bucket is a sorted list
+# of these keys so filtered listings can bisect straight to a cursor.
+SortKey = Tuple[str, str]
+
+# Index keys a query may examine per call beyond its page size. Sparse
+# intersections that exhaust it return a partial page with a cursor.
+MAX_SCAN = 128
+# Calls query_page() makes to fill one page before handing back a cursor.
+MAX_PAGE_ROUNDS = 32
+
+# An indexed (name, value) pair: a field, or "metadata.<key>" for metadata
+Term = Tuple[str, Any]
+
+
+def _sort_key(record: Dict) -> SortKey:
+    return (record.get("created_at") or "", record["id"])
+
+
+def _index_value(value: Any) -> Optional[str]:
+    """Normalize a metadata value to the string form used in query params."""
+    if isinstance(value, str):
+        return value
+    if value is None or isinstance(value, (bool, int, float)):
+        return json.dumps(value)
+    # Nested values are not indexed
+    return None
+
+
+def _bucket_add(bucket: List[SortKey], key: SortKey) -> None:
+    insort(bucket, key)
+
+
+def _bucket_remove(bucket: List[SortKey], key: SortKey) -> None:
+    i = bisect_left(bucket, key)
+    if i < len(bucket) and bucket[i] == key:
+        del bucket[i]
+
+
+def encode_cursor(key: SortKey) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> SortKey:
+    try:
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (str(created_at), str(record_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class IndexedStore(MutableMapping):
+    """In-memory record store with secondary indexes maintained on write.
+
+    Behaves like the plain ``Dict[str, Dict]`` it replaces, and additionally
+    keeps a created_at ordering and indexes on terms: each field in ``fields``
+    and each scalar ``metadata`` key/value pair. Every pair of terms on a
+    record is indexed as well, so any two-constraint filter reads one bucket.
+    """
+
+    def __init__(self, fields: Iterable[str] = (), max_scan: int = MAX_SCAN):
+        self._records: Dict[str, Dict] = {}
+        self._order: List[SortKey] = []
+        self._fields = tuple(fields)
+        self.max_scan = max_scan
+        self._term_index: Dict[Term, List[SortKey]] = {}
+        self._pair_index: Dict[Tuple[Term, Term], List[SortKey]] = {}
+
+    def __getitem__(self, record_id: str) -> Dict:
+        return self._records[record_id]
+
+    def __setitem__(self, record_id: str, record: Dict) -> None:
+        with span("storage.set"):
+            if record_id in self._records:
+                self._unindex(self._records[record_id])
+            self._records[record_id] = record
+            self._index(record)
+
+    def __delitem__(self, record_id: str) -> None:
+        with span("storage.delete"):
+            record = self._records.pop(record_id)
+            self._unindex(record)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, record_id: object) -> bool:
+        return record_id in self._records
+
+    def _terms(self, record: Dict) -> List[Term]:
+        terms = [(f, record[f]) for f in self._fields if record.get(f) is not None]
+        for k, v in (record.get("metadata") or {}).items():
+            value = _index_value(v)
+            if value is not None:
+                terms.append((f"metadata.{k}", value))
+        # Names are unique per record, so sorting by name gives canonical pairs
+        return sorted(terms, key=lambda t: t[0])
+
+    @staticmethod
+    def _pairs(terms: List[Term]) -> Iterator[Tuple[Term, Term]]:
+        for i, first in enumerate(terms):
+            for second in terms[i + 1:]:
+                yield (first, second)
+
+    def _index(self, record: Dict) -> None:
+        key = _sort_key(record)
+        _bucket_add(self._order, key)
+        terms = self._terms(record)
+        for term in terms:
+            _bucket_add(self._term_index.setdefault(term, []), key)
+        for pair in self._pairs(terms):
+            _bucket_add(self._pair_index.setdefault(pair, []), key)
+
+    @staticmethod
+    def _remove_from(index: Dict, index_key: Any, key: SortKey) -> None:
+        bucket = index.get(index_key)
+        if bucket is not None:
+            _bucket_remove(bucket, key)
+            if not bucket:
+                del index[index_key]
+
+    def _unindex(self, record: Dict) -> None:
+        key = _sort_key(record)
+        _bucket_remove(self._order, key)
+        terms = self._terms(record)
+        for term in terms:
+            self._remove_from(self._term_index, term, key)
+        for pair in self._pairs(terms):
+            self._remove_from(self._pair_index, pair, key)
+
+    def query(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Return up to ``limit`` matching records in created_at order.
+
+        ``filters`` match indexed fields exactly; ``metadata`` values match the
+        string form of scalar metadata values. Returns the page and a cursor
+        for the next page, or ``None`` when there are no more results.
+
+        At most ``limit + max_scan`` index keys are examined per call, so a
+        sparse intersection can return a short (even empty) page with a cursor.
+        """
+        with span("storage.query"):
+            terms: List[Term] = []
+            for field, value in (filters or {}).items():
+                if field not in self._fields:
+                    raise ValueError(f"Field is not indexed: {field}")
+                terms.append((field, value))
+            terms += [(f"metadata.{k}", v) for k, v in (metadata or {}).items()]
+            terms.sort(key=lambda t: t[0])
+
+            if not terms:
+                buckets = [self._order]
+            elif len(terms) == 1:
+                buckets = [self._term_index.get(terms[0], [])]
+            else:
+                # Every pair, so the sparsest combination drives the scan
+                buckets = [self._pair_index.get(pair, []) for pair in self._pairs(terms)]
+
+            # Walk the most selective bucket and probe the others
+            buckets.sort(key=len)
+            driver, others = buckets[0], buckets[1:]
+            start = bisect_right(driver, decode_cursor(cursor)) if cursor else 0
+            end = min(len(driver), start + limit + self.max_scan)
+
+            # Driver keys ascend, so each probe can start where the last one landed
+            lows = [0] * len(others)
+            page: List[SortKey] = []
+            for i in range(start, end):
+                key = driver[i]
+                for n, bucket in enumerate(others):
+                    j = lows[n] = bisect_left(bucket, key, lows[n])
+                    if j == len(bucket) or bucket[j] != key:
+                        break
+                else:
+                    if len(page) == limit:
+                        return [self._records[k[1]] for k in page], encode_cursor(page[-1])
+                    page.append(key)
+            records = [self._records[k[1]] for k in page]
+            if end < len(driver):
+                # Scan budget exhausted; resume after the last key examined
+                return records, encode_cursor(driver[end - 1])
+            return records, None
+
+    def query_page(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        max_rounds: int = MAX_PAGE_ROUNDS,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Like ``query`` but keeps scanning until the page is full.
+
+        Stops early only after ``max_rounds`` calls, which can happen for very
+        sparse intersections of three or more constraints.
+        """
+        records: List[Dict] = []
+        for _ in range(max_rounds):
+            data, cursor = self.query(filters, metadata, limit - len(records), cursor)
+            records.extend(data)
+            if cursor is None or len(records) == limit:
+                break
+        return records, cursor
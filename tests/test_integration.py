@@ -1,5 +1,24 @@
+import asyncio
+import httpx
+import subprocess
+import sys
+import time
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from server import main as server_main
 from server.main import app
+from typing import TypedDict
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langgraph.graph import StateGraph, END
+from server.admin import router as admin_router
+from server.callbacks import NodeSpanCallback
+from server.cache import Cache
+from server.idempotency import IdempotencyStore
+from server.middleware import RequestProfiler
+from server.langsmith import LANGSMITH_CREATED_AT, SnapshotMiddleware
+from server.storage import IndexedStore
+from server import profiling
+from server.profiling import PROFILING_ENABLED, current_profile, profiles, span
 
 client = TestClient(app)
 
@@ -58,6 +77,390 @@ def test_chat_flow():
     assert get_run_response.status_code == 200
     assert get_run_response.json()["status"] == "completed"
 
+def test_indexed_store_bounded_scan():
+    # max_scan=0: each query call examines only as many keys as it could return
+    store = IndexedStore(fields=("assistant_id",), max_scan=0)
+    for i in range(100):
+        store[f"thread_{i:03d}"] = {
+            "id": f"thread_{i:03d}",
+            "assistant_id": "asst_a" if i % 2 else "asst_b",
+            "metadata": {"user": "alice" if i % 2 else "bob", "vip": i % 7 == 0, "region": str(i % 3)},
+            "created_at": f"2024-01-01T00:00:{i:02d}",
+        }
+
+    # Any two constraints are answered from the pair index without scanning
+    data, cursor = store.query({"assistant_id": "asst_a"}, {"user": "bob"}, limit=5)
+    assert data == [] and cursor is None
+    data, cursor = store.query(metadata={"user": "alice", "vip": "true"}, limit=5)
+    assert [r["id"] for r in data] == ["thread_007", "thread_021", "thread_035", "thread_049", "thread_063"]
+
+    # Sparser three-way intersections can come back short from a single call...
+    three_way = {"user": "alice", "vip": "true", "region": "0"}
+    data, cursor = store.query(metadata=three_way, limit=1)
+    assert data == [] and cursor is not None
+
+    # ...while query_page keeps going until the page is full
+    data, cursor = store.query_page(metadata=three_way, limit=2)
+    assert [r["id"] for r in data] == ["thread_021", "thread_063"]
+    data, cursor = store.query_page(metadata=three_way, limit=2, cursor=cursor)
+    assert data == [] and cursor is None
+
+    data, cursor = store.query_page(metadata=three_way, limit=1, max_rounds=1)
+    assert data == [] and cursor is not None
+
+    # Unfiltered pages are not truncated by the scan budget
+    data, cursor = store.query(limit=50)
+    assert len(data) == 50 and cursor is not None
+
+def test_list_threads_sparse_filters_fill_page():
+    from server.routes import threads
+    ids = [f"thread_sparse_{i:03d}" for i in range(800)]
+    for i, thread_id in enumerate(ids):
+        threads[thread_id] = {
+            "id": thread_id,
+            "assistant_id": "asst_sparse",
+            "metadata": {"u": "x" if i % 2 == 0 else "y", "vip": i % 2 == 1 or i == 798},
+            "created_at": f"2000-01-01T00:00:00.{i:06d}",
+            "messages": [],
+        }
+    try:
+        response = client.get("/v1/threads", params={
+            "assistant_id": "asst_sparse", "metadata.u": "x", "metadata.vip": "true", "limit": 5
+        })
+        assert response.json() == {
+            "data": [threads["thread_sparse_798"]], "has_more": False, "next_cursor": None
+        }
+    finally:
+        for thread_id in ids:
+            del threads[thread_id]
+
+def test_list_threads_filtered():
+    assistant = client.post("/v1/assistants", json={"name": "Filter Assistant"}).json()
+    for i in range(3):
+        client.post("/v1/threads", json={
+            "assistant_id": assistant["id"],
+            "metadata": {"user": "alice" if i < 2 else "bob", "priority": i}
+        })
+
+    response = client.get("/v1/threads", params={"assistant_id": assistant["id"]})
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 3
+
+    response = client.get("/v1/threads", params={
+        "assistant_id": assistant["id"],
+        "metadata.user": "alice"
+    })
+    data = response.json()["data"]
+    assert len(data) == 2
+    assert all(t["metadata"]["user"] == "alice" for t in data)
+
+    response = client.get("/v1/threads", params={"metadata.priority": "2"})
+    assert [t["metadata"]["user"] for t in response.json()["data"]] == ["bob"]
+
+def test_list_threads_pagination():
+    assistant = client.post("/v1/assistants", json={"name": "Paging Assistant"}).json()
+    created = [
+        client.post("/v1/threads", json={"assistant_id": assistant["id"]}).json()["id"]
+        for _ in range(5)
+    ]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"assistant_id": assistant["id"], "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/v1/threads", params=params).json()
+        seen.extend(t["id"] for t in page["data"])
+        if not page["has_more"]:
+            break
+        cursor = page["next_cursor"]
+    assert seen == created
+
+    response = client.get("/v1/threads", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_list_deployments_filtered():
+    client.post("/deployments", json={"name": "Indexed Deployment", "metadata": {"env": "staging"}})
+    response = client.get("/deployments", params={"status": "active", "metadata.env": "staging"})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert len(data) == 1
+    assert data[0]["name"] == "Indexed Deployment"
+
+def test_langsmith_snapshot_etag():
+    response1 = client.get("/orgs/current/info")
+    assert response1.status_code == 200
+    etag = response1.headers["etag"]
+    assert "max-age" in response1.headers["cache-control"]
+
+    # Timestamps are stable across polls
+    response2 = client.get("/orgs/current/info")
+    assert response2.json()["created_at"] == LANGSMITH_CREATED_AT
+    assert response1.json()["created_at"] == LANGSMITH_CREATED_AT
+    assert response2.headers["etag"] == etag
+
+    response3 = client.get("/orgs/current/info", headers={"If-None-Match": etag})
+    assert response3.status_code == 304
+    assert response3.content == b""
+
+def test_langsmith_polling_not_rate_limited():
+    for _ in range(70):
+        response = client.get("/tenants")
+        assert response.status_code == 200
+
+def test_langsmith_snapshots_served_outermost():
+    # Polls are answered before the function middlewares, so the snapshot
+    # middleware has to supply the CORS headers itself
+    assert app.user_middleware[0].cls is SnapshotMiddleware
+    response = client.get("/workspaces")
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == "*"
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["data"][0]["created_at"] == LANGSMITH_CREATED_AT
+
+    etag = response.headers["etag"]
+    response = client.get("/workspaces", headers={"If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.headers["access-control-allow-origin"] == "*"
+
+    # Other methods fall through to the app
+    assert client.post("/workspaces").status_code == 405
+
+def test_profiling_disabled_overhead():
+    assert current_profile() is None
+    # With no active profile every span is the same shared no-op context manager
+    assert span("cache.get") is span("storage.query")
+
+    if not PROFILING_ENABLED:
+        assert not any(
+            isinstance(m.kwargs.get("dispatch"), RequestProfiler) for m in app.user_middleware
+        )
+        assert client.get("/admin/profiles").status_code == 404
+
+def test_profiling_module_has_no_langchain_dependency():
+    code = "import sys, server.storage, server.cache; print('langchain_core' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+def test_request_profiler(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+    profiled_app = FastAPI()
+    profiled_app.middleware("http")(RequestProfiler())
+    profiled_app.include_router(admin_router)
+
+    @profiled_app.get("/work")
+    async def work():
+        with span("sleep"):
+            time.sleep(0.05)
+        return {"ok": True}
+
+    profiled_client = TestClient(profiled_app)
+    profiles.clear()
+
+    response = profiled_client.get("/work")
+    assert "x-profile-id" not in response.headers
+
+    # Without the shared secret the header does not start a profile
+    response = profiled_client.get("/work", headers={"X-Profile": "1"})
+    assert "x-profile-id" not in response.headers
+    assert profiles.recent() == []
+
+    response = profiled_client.get("/work", headers={"X-Profile": "s3cret"})
+    profile_id = response.headers["x-profile-id"]
+
+    admin = {"X-Profile-Token": "s3cret"}
+    summary = profiled_client.get("/admin/profiles", headers=admin).json()["data"][0]
+    assert summary["id"] == profile_id
+    assert [s["name"] for s in summary["spans"]] == ["sleep"]
+    assert summary["spans"][0]["duration_ms"] >= 50
+
+    collapsed = profiled_client.get("/admin/profiles/collapsed", headers=admin).text
+    assert collapsed.startswith("GET /work;")
+    assert "span:sleep;" in collapsed
+    assert profiled_client.get(f"/admin/profiles/{profile_id}/collapsed", headers=admin).text == collapsed
+
+def test_node_spans_and_frames(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+    model = FakeListChatModel(responses=["pong"])
+
+    class State(TypedDict):
+        reply: str
+
+    def slow_node(state: State) -> State:
+        time.sleep(0.05)
+        return {"reply": model.invoke("ping").content}
+
+    workflow = StateGraph(State)
+    workflow.add_node("slow_node", slow_node)
+    workflow.set_entry_point("slow_node")
+    workflow.add_edge("slow_node", END)
+    graph = workflow.compile()
+
+    profiled_app = FastAPI()
+    profiled_app.middleware("http")(RequestProfiler())
+
+    @profiled_app.post("/invoke")
+    async def invoke():
+        config = {"callbacks": [NodeSpanCallback(current_profile())]}
+        return await graph.ainvoke({"reply": ""}, config=config)
+
+    profiles.clear()
+    response = TestClient(profiled_app).post("/invoke", headers={"X-Profile": "s3cret"})
+    assert response.json() == {"reply": "pong"}
+
+    profile = profiles.recent()[-1]
+    names = [s["name"] for s in profile.spans]
+    assert "node:slow_node" in names
+    assert any(name.startswith("llm:") for name in names)
+    node_span = next(s for s in profile.spans if s["name"] == "node:slow_node")
+    assert node_span["duration_ms"] >= 50
+    # The sync node runs in an executor thread, which is sampled too
+    assert "slow_node (test_integration.py:" in profile.collapsed()
+
+def test_profile_admin_requires_token(monkeypatch):
+    admin_app = FastAPI()
+    admin_app.include_router(admin_router)
+    admin_client = TestClient(admin_app)
+
+    # No token configured: admin endpoints are unreachable
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "")
+    assert admin_client.get("/admin/profiles").status_code == 404
+    assert admin_client.get("/admin/profiles", headers={"X-Profile-Token": ""}).status_code == 404
+
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+    assert admin_client.get("/admin/profiles").status_code == 404
+    assert admin_client.get("/admin/profiles/collapsed", headers={"X-Profile-Token": "wrong"}).status_code == 404
+    assert admin_client.get("/admin/profiles", headers={"X-Profile-Token": "s3cret"}).status_code == 200
+
+def test_idempotent_message_retry():
+    thread_id = client.post("/v1/threads", json={"assistant_id": "asst_default"}).json()["id"]
+    body = {"thread_id": thread_id, "role": "user", "content": "Retry me"}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post(f"/v1/threads/{thread_id}/messages", json=body, headers=headers)
+    assert first.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+
+    second = client.post(f"/v1/threads/{thread_id}/messages", json=body, headers=headers)
+    assert second.status_code == 200
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.json() == first.json()
+
+    # Same content without a key is deduplicated by content hash
+    third = client.post(f"/v1/threads/{thread_id}/messages", json=body)
+    fourth = client.post(f"/v1/threads/{thread_id}/messages", json=body)
+    assert fourth.json()["id"] == third.json()["id"]
+
+    messages = client.get(f"/v1/threads/{thread_id}/messages").json()["data"]
+    assert len(messages) == 2
+
+    conflict = client.post(f"/v1/threads/{thread_id}/messages",
+                           json={**body, "content": "Different"}, headers=headers)
+    assert conflict.status_code == 422
+
+def _local_idempotency_store():
+    # Keep these tests off Redis even when REDIS_URL is set
+    cache = Cache()
+    cache.enabled = False
+    return IdempotencyStore(cache=cache)
+
+def test_idempotency_single_flight():
+    store = _local_idempotency_store()
+    calls = []
+
+    async def slow_invoke():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": 42}
+
+    async def run():
+        return await asyncio.gather(*[
+            store.run("invoke", {"message": "hi"}, slow_invoke) for _ in range(5)
+        ])
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [r for r, _ in results] == [{"answer": 42}] * 5
+    assert sorted(replayed for _, replayed in results) == [False] + [True] * 4
+
+def test_idempotency_failures_not_stored():
+    store = _local_idempotency_store()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise RuntimeError("model timeout")
+
+    async def run():
+        for _ in range(2):
+            try:
+                await store.run("invoke", {"message": "hi"}, failing)
+            except RuntimeError:
+                pass
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+def test_idempotency_cancelled_owner_does_not_cancel_waiters():
+    store = _local_idempotency_store()
+    calls = []
+
+    async def invoke():
+        calls.append(1)
+        await asyncio.sleep(10 if len(calls) == 1 else 0.01)
+        return {"answer": len(calls)}
+
+    async def run():
+        owner = asyncio.create_task(store.run("invoke", {"message": "hi"}, invoke))
+        await asyncio.sleep(0.01)
+        retries = [asyncio.create_task(store.run("invoke", {"message": "hi"}, invoke)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        # e.g. the original client disconnected
+        owner.cancel()
+        results = await asyncio.gather(*retries)
+        assert owner.cancelled()
+        return results
+
+    results = asyncio.run(run())
+    assert len(calls) == 2
+    assert [r for r, _ in results] == [{"answer": 2}] * 3
+    assert sorted(replayed for _, replayed in results) == [False, True, True]
+
+def test_invoke_single_flight_through_app(monkeypatch):
+    calls = []
+    finished = []
+
+    class SlowGraph:
+        async def ainvoke(self, data, config=None):
+            calls.append(data)
+            await asyncio.sleep(0.2)
+            finished.append(time.perf_counter())
+            return {"echo": data}
+
+    monkeypatch.setattr(server_main, "graph", SlowGraph())
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            invokes = [
+                asyncio.create_task(http.post("/v1/invoke", json={"message": "single-flight"}))
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0.05)
+            # The event loop keeps serving other requests while the graph runs
+            health = await http.get("/v1/health")
+            health_done = time.perf_counter()
+            return health, health_done, await asyncio.gather(*invokes)
+
+    health, health_done, responses = asyncio.run(run())
+    assert health.status_code == 200
+    assert health_done < finished[0]
+    assert len(calls) == 1
+    assert [r.json() for r in responses] == [{"echo": {"message": "single-flight"}}] * 3
+    assert sum(r.headers.get("idempotent-replayed") == "true" for r in responses) == 2
+
 def test_rate_limiter():
     # Test rate limiting by making multiple requests
     for _ in range(61):  # One over the limit